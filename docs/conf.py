@@ -21,6 +21,11 @@ try:
         sys.modules[module] = Mock()
         print("Mocked '{}' module".format(module))
 
+    # Viper pointer types used in annotations only exist under MicroPython
+    import builtins
+
+    builtins.ptr8 = builtins.ptr32 = Mock()
+
     import micropython_bmm150
 except ImportError:
     raise SystemExit("micropython_bmm150 has to be importable")
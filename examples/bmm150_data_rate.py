@@ -9,14 +9,16 @@ from micropython_bmm150 import bmm150
 i2c = I2C(1, sda=Pin(2), scl=Pin(3))  # Correct I2C pins for RP2040
 bmm = bmm150.BMM150(i2c)
 
+_FMT = "x:%.2fT, y:%.2fT, z:%.2fT"
+
 bmm.data_rate = bmm150.RATE_2HZ
 
 while True:
     for data_rate in bmm150.data_rate_values:
         print("Current Data rate setting: ", bmm.data_rate)
         for _ in range(10):
-            magx, magy, magz = bmm.magnetic
-            print("x:{:.2f}T, y:{:.2f}T, z:{:.2f}T".format(magx, magy, magz))
+            magx, magy, magz, _ = bmm.measurements
+            print(_FMT % (magx, magy, magz))
             print()
             time.sleep(0.5)
-        bmm.data_rate = data_rate
+        bmm.set_mode(bmm150.NORMAL, data_rate)
@@ -13,8 +13,8 @@ bmm.interrupt_mode = bmm150.INT_ENABLED
 bmm.high_threshold = 100
 
 while True:
-    magx, magy, magz, _ = bmm.measurements
+    magx, magy, magz, _, status = bmm.sample_all()
     print(f"x: {magx}uT, y: {magy}uT, z:{magz}uT")
-    print(bmm.status_interrupt)
+    print(status)
     print()
     time.sleep(0.5)
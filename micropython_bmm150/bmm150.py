@@ -13,16 +13,12 @@ MicroPython Driver for the Bosch BMM150 Magnetometer
 
 """
 
-from collections import namedtuple
+import time
+from array import array
+import micropython
 from micropython import const
 from micropython_bmm150.i2c_helpers import CBits, RegisterStruct
 
-try:
-    from typing import Tuple
-except ImportError:
-    pass
-
-
 __version__ = "0.0.0+auto.0"
 __repo__ = "https://github.com/jposada202020/MicroPython_BMM150.git"
 
@@ -37,10 +33,12 @@ NORMAL = const(0b00)
 FORCED = const(0b01)
 SLEEP = const(0b11)
 operation_mode_values = (NORMAL, FORCED, SLEEP)
+_OP_MODE_NAMES = ("NORMAL", "FORCED", None, "SLEEP")
 
 INT_DISABLED = const(0x1F)
 INT_ENABLED = const(0x00)
 interrupt_mode_values = (INT_DISABLED, INT_ENABLED)
+_INT_MODE_NAMES = {INT_DISABLED: "INT_DISABLED", INT_ENABLED: "INT_ENABLED"}
 
 RATE_10HZ = const(0b000)
 RATE_2HZ = const(0b001)
@@ -60,12 +58,55 @@ data_rate_values = (
     RATE_25HZ,
     RATE_30HZ,
 )
+_DATA_RATE_NAMES = (
+    "RATE_10HZ",
+    "RATE_2HZ",
+    "RATE_6HZ",
+    "RATE_8HZ",
+    "RATE_15HZ",
+    "RATE_20HZ",
+    "RATE_25HZ",
+    "RATE_30HZ",
+)
 
-AlertStatus = namedtuple(
-    "AlertStatus", ["high_x", "high_y", "high_z", "low_x", "low_y", "low_z"]
+HIGH_X = const(0)
+HIGH_Y = const(1)
+HIGH_Z = const(2)
+LOW_X = const(3)
+LOW_Y = const(4)
+LOW_Z = const(5)
+
+_ALERT_LUT = tuple(
+    (
+        (d >> 3) & 1,
+        (d >> 4) & 1,
+        (d >> 5) & 1,
+        d & 1,
+        (d >> 1) & 1,
+        (d >> 2) & 1,
+    )
+    for d in range(64)
 )
 
 
+@micropython.viper
+def _decode(
+    buf: ptr8, out: ptr32, offset: int, hall: int  # pylint: disable=undefined-variable
+):
+    # Decode the raw little endian data block in buf into out starting at
+    # offset, sign extending each word and dropping the status bits. The
+    # hall resistance is only stored when hall is set.
+    raw = int(buf[0]) | (int(buf[1]) << 8)
+    out[offset] = ((raw ^ 0x8000) - 0x8000) >> 3
+    raw = int(buf[2]) | (int(buf[3]) << 8)
+    out[offset + 1] = ((raw ^ 0x8000) - 0x8000) >> 3
+    raw = int(buf[4]) | (int(buf[5]) << 8)
+    out[offset + 2] = ((raw ^ 0x8000) - 0x8000) >> 1
+    if hall:
+        raw = int(buf[6]) | (int(buf[7]) << 8)
+        out[offset + 3] = ((raw ^ 0x8000) - 0x8000) >> 2
+
+
 class BMM150:
     """Driver for the BMM150 Sensor connected over I2C.
 
@@ -102,8 +143,6 @@ class BMM150:
     _device_id = RegisterStruct(_REG_WHOAMI, "B")
 
     _operation_mode = CBits(2, _OPERATION_MODE, 1)
-    _raw_data = RegisterStruct(_DATA, "<hhhh")
-    _raw_x = RegisterStruct(_DATA, "<H")
 
     _interrupt = RegisterStruct(0x4D, "B")
     _status_interrupt = RegisterStruct(0x4A, "B")
@@ -112,13 +151,17 @@ class BMM150:
     _high_threshold = RegisterStruct(_HIGH_THRESHOLD, "B")
     _low_threshold = RegisterStruct(_LOW_THRESHOLD, "B")
 
-    _data_rate = CBits(2, _OPERATION_MODE, 0)
+    _data_rate = CBits(3, _OPERATION_MODE, 3)
 
     def __init__(self, i2c, address: int = 0x13) -> None:
         self._i2c = i2c
         self._address = address
+        self._mag_buf = bytearray(8)
+        self._mag_out = array("i", [0] * 4)
+        self._combined_buf = bytearray(9)
 
-        self._power_mode = True
+        i2c.writeto_mem(address, _POWER_CONTROL, b"\x01")
+        time.sleep(0.003)
 
         if self._device_id != 0x32:
             raise RuntimeError("Failed to find BMM150")
@@ -140,8 +183,7 @@ class BMM150:
         | :py:const:`bmm150.SLEEP`  | :py:const:`0b11` |
         +---------------------------+------------------+
         """
-        values = ("NORMAL", "FORCED", "SLEEP")
-        return values[self._operation_mode]
+        return _OP_MODE_NAMES[self._operation_mode]
 
     @operation_mode.setter
     def operation_mode(self, value: int) -> None:
@@ -150,43 +192,95 @@ class BMM150:
         self._operation_mode = value
 
     @property
-    def measurements(self) -> Tuple[float, float, float, float]:
+    def measurements(self) -> tuple:
         """
         Return Magnetometer data and hall resistance.
         This is Raw data. There are some code exposed from bosch in their
         github to adjust this data, however this is not exposed in the
         datasheet.
         """
-        raw_magx, raw_magy, raw_magz, raw_rhall = self._raw_data
+        self._i2c.readfrom_mem_into(self._address, _DATA, self._mag_buf)
+        out = self._mag_out
+        _decode(self._mag_buf, out, 0, 1)
+
+        return out[0], out[1], out[2], out[3]
+
+    def sample_all(self):
+        """
+        Return Magnetometer data, hall resistance and the interrupt status
+        read in a single I2C transaction, as
+        ``(magx, magy, magz, hall, status_interrupt)``.
+        """
+        buf = self._combined_buf
+        self._i2c.readfrom_mem_into(self._address, _DATA, buf)
+        out = self._mag_out
+        _decode(buf, out, 0, 1)
+
+        return out[0], out[1], out[2], out[3], _ALERT_LUT[buf[8] & 0x3F]
+
+    def stream(self, n: int, out) -> None:
+        """
+        Read ``n`` consecutive magnetometer samples into ``out`` without
+        allocating. ``out`` must be an ``array("i")`` of at least ``3 * n``
+        elements, filled as ``x, y, z`` triplets. Each sample waits for the
+        data ready flag, so this blocks for about ``n`` output data periods.
+        The sensor must be in ``NORMAL`` operation mode.
+
+        .. code-block:: python
+
+            from array import array
 
-        magx = raw_magx >> 3
-        magy = raw_magy >> 3
-        magz = raw_magz >> 1
-        hall = raw_rhall >> 2
+            n = 10
+            samples = array("i", [0] * (3 * n))
+            bmm.operation_mode = bmm150.NORMAL
+            bmm.stream(n, samples)
+            for i in range(0, 3 * n, 3):
+                print(samples[i], samples[i + 1], samples[i + 2])
 
-        return magx, magy, magz, hall
+        :param int n: number of samples to read
+        :param array out: caller owned buffer for the samples
+
+        :raises RuntimeError: if the sensor is not in ``NORMAL`` operation mode
+        :raises ValueError: if ``out`` is not a large enough ``array("i")``
+        """
+        if self._operation_mode != NORMAL:
+            raise RuntimeError("stream requires NORMAL operation mode")
+        if len(out) < 3 * n or len(bytes(memoryview(out)[:1])) != 4:
+            raise ValueError('out must be an array("i") of at least 3 * n values')
+        buf = self._mag_buf
+        i2c = self._i2c
+        address = self._address
+        for i in range(n):
+            i2c.readfrom_mem_into(address, _DATA, buf)
+            while not buf[6] & 0x01:
+                i2c.readfrom_mem_into(address, _DATA, buf)
+            _decode(buf, out, i * 3, 0)
 
     @property
-    def high_threshold(self) -> float:
+    def high_threshold(self) -> int:
         """
         High threshold value
         """
-        return self._high_threshold * 16
+        return self._high_threshold << 4
 
     @high_threshold.setter
     def high_threshold(self, value: int) -> None:
-        self._high_threshold = int(value / 16)
+        if not 0 <= value <= 4095:
+            raise ValueError("Value must be a valid high_threshold setting")
+        self._high_threshold = int(value) >> 4
 
     @property
-    def low_threshold(self) -> float:
+    def low_threshold(self) -> int:
         """
         Low threshold value
         """
-        return self._low_threshold * 16
+        return self._low_threshold << 4
 
     @low_threshold.setter
     def low_threshold(self, value: int) -> None:
-        self._low_threshold = int(value / 16)
+        if not 0 <= value <= 4095:
+            raise ValueError("Value must be a valid low_threshold setting")
+        self._low_threshold = int(value) >> 4
 
     @property
     def interrupt_mode(self) -> str:
@@ -201,8 +295,7 @@ class BMM150:
         | :py:const:`bmm150.INT_ENABLED`  | :py:const:`0xFF` |
         +---------------------------------+------------------+
         """
-        values = {INT_DISABLED: "INT_DISABLED", INT_ENABLED: "INT_ENABLED"}
-        return values[self._interrupt]
+        return _INT_MODE_NAMES[self._interrupt]
 
     @interrupt_mode.setter
     def interrupt_mode(self, value: int) -> None:
@@ -213,19 +306,10 @@ class BMM150:
     @property
     def status_interrupt(self):
         """
-        Interrupt Status.
+        Interrupt Status, as a ``(high_x, high_y, high_z, low_x, low_y, low_z)``
+        tuple. Use :const:`HIGH_X` ... :const:`LOW_Z` to index it.
         """
-        data = self._status_interrupt
-        highz = (data & 0x20) >> 5
-        highy = (data & 0x10) >> 4
-        highx = (data & 0x08) >> 3
-        lowz = (data & 0x04) >> 2
-        lowy = (data & 0x02) >> 1
-        lowx = data & 0x01
-
-        return AlertStatus(
-            high_x=highx, high_y=highy, high_z=highz, low_x=lowx, low_y=lowy, low_z=lowz
-        )
+        return _ALERT_LUT[self._status_interrupt & 0x3F]
 
     @property
     def data_rate(self) -> str:
@@ -252,20 +336,26 @@ class BMM150:
         | :py:const:`bmm150.RATE_30HZ` | :py:const:`0b111` |
         +------------------------------+-------------------+
         """
-        values = (
-            "RATE_10HZ",
-            "RATE_2HZ",
-            "RATE_6HZ",
-            "RATE_8HZ",
-            "RATE_15HZ",
-            "RATE_20HZ",
-            "RATE_25HZ",
-            "RATE_30HZ",
-        )
-        return values[self._data_rate]
+        return _DATA_RATE_NAMES[self._data_rate]
 
     @data_rate.setter
     def data_rate(self, value: int) -> None:
         if value not in data_rate_values:
             raise ValueError("Value must be a valid data_rate setting")
         self._data_rate = value
+
+    def set_mode(self, op_mode: int, rate: int) -> None:
+        """
+        Set the operation mode and the data rate with a single register write.
+
+        :param int op_mode: operation mode, see :attr:`operation_mode`
+        :param int rate: data rate, see :attr:`data_rate`
+        """
+        if op_mode not in operation_mode_values:
+            raise ValueError("Value must be a valid operation_mode setting")
+        if rate not in data_rate_values:
+            raise ValueError("Value must be a valid data_rate setting")
+        reg = self._i2c.readfrom_mem(self._address, _OPERATION_MODE, 1)[0]
+        reg &= ~0x3E
+        reg |= (op_mode << 1) | (rate << 3)
+        self._i2c.writeto_mem(self._address, _OPERATION_MODE, bytes([reg]))